@@ -4,9 +4,53 @@ See https://github.com/Syniti/software-engineer-questions
 Validation implemented in the class DataValidator.
 """
 
+import argparse
+import codecs
 import json
+import os
+import re
+import sys
 import unittest
 
+try:
+    # optional: faster C parser, produces the same dict/list types
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # optional: incremental parser, used to stream large files
+    import ijson
+except ImportError:
+    ijson = None
+
+# 00000, 00000-0000, or 000000000 (ASCII digits only)
+ZIP_CODE_MATCH = re.compile(r'[0-9]{5}(?:-?[0-9]{4})?').fullmatch
+
+# empty values that count as blank; compared with ==, so 0 and false are not
+BLANK_VALUES = ('', [], {})
+
+# files larger than this (in bytes) are streamed rather than loaded at once
+STREAM_THRESHOLD = 64 << 20
+
+# read size when streaming; ijson re-copies a value that spans reads, so a
+# large buffer keeps long fields from being copied once per small chunk
+STREAM_BUFFER_SIZE = 1 << 20
+
+def load_json(data):
+    """
+    Parse JSON from bytes, with orjson if it is installed. orjson is stricter
+    than the stdlib (no NaN/Infinity, no integers over 64 bits, no UTF-8 BOM),
+    so on a parse error retry with json.loads, which accepts the same input
+    regardless of whether orjson is available.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
 class NoIDError(KeyError):
     """Raise if malformed record does not have an ID."""
 
@@ -17,61 +61,41 @@ class DataValidator():
     def __init__(self):
         """
         self.bad_records: set of ids of invalid records
-        self.records_seen: dictionary of processed records (key/hash: string of data except id, value: record id)
+        self.records_seen: dictionary of processed records (key/hash: fingerprint of data except id, value: record id)
         """
         self.bad_records = set()
         self.records_seen = {}
 
-    def remove_id(self, record):
-        """
-        Return a record with all fields except the ID.
-        """
-        d = {}
-        for k in record.keys():
-            if k != "id":
-                d[k] = record[k]
-        return d
-
-    def have_seen(self, record):
+    def fingerprint(self, record):
         """
-        Determines if a duplicate record has already been processed.
-        Comparison made on the basis of all keys except 'id'. If record is
-        unique, add it to self.record_seen.
+        Return a hashable key for a record built from all fields except the ID.
+        Field order does not matter. Non-string values are keyed with their
+        type, since 1, 1.0 and True are equal in Python but not in JSON. If a
+        value is unhashable (e.g. a nested list), fall back to the repr of the
+        items sorted by key.
         """
-        record_string = str( self.remove_id(record) )
-        if record_string in self.records_seen:
-            return True
-
-        self.records_seen[record_string] = record['id']
-        return False
+        try:
+            return frozenset((k, v) if type(v) is str else (k, type(v), v)
+                             for k, v in record.items() if k != 'id')
+        except TypeError:
+            return repr(sorted((k, v) for k, v in record.items() if k != 'id'))
 
     def is_null_missing_blank(self, record, key):
         """
         Determines if a key in a record is missing, is None, or is blank.
+        Blank means an empty string, list, or object; 0 and false are not blank.
         """
-        if key not in record.keys():
-            return True
-        if record[key] is None:
-            return True
-        if len(record[key]) == 0:
-            return True
-
-        return False
+        value = record.get(key)
+        return value is None or value in BLANK_VALUES
 
     def valid_zip_code(self, zip_code):
         """
         Determines if a ZIP code is valid.
         Accepted formats: 00000, 00000-0000, 000000000 (no hyphen)
-        (note that ZIP is expected as a string in the source data)
+        (note that ZIP is expected as a string in the source data; any other
+        type is invalid)
         """
-        if zip_code.isnumeric() and ( len(zip_code) == 5 or len(zip_code) == 9):
-            return True
-        if '-' in zip_code:
-            a = zip_code.split('-')
-            if len(a) == 2:
-                if a[0].isnumeric() and len(a[0]) == 5 and a[1].isnumeric() and len(a[1]) == 4:
-                    return True
-        return False
+        return type(zip_code) is str and ZIP_CODE_MATCH(zip_code) is not None
 
     def add_to_bad_records(self, record):
         """
@@ -79,51 +103,86 @@ class DataValidator():
         """
         self.bad_records.add(record['id'])
 
-    def add_duplicate_to_bad_records(self, record):
-        """
-        Add a previously-seen duplicate of a record to self.bad_records
-        """
-        record_string = str( self.remove_id(record) )
-        if record_string in self.records_seen:
-            self.bad_records.add( self.records_seen[record_string] )
-
     def record_is_valid(self, record):
         """
         Determine if a single record is valid.
         Each record is a dictionary of key-value pairs.
         """
-        if 'id' not in record.keys():
+        if 'id' not in record:
             raise NoIDError
-        if self.is_null_missing_blank(record, 'name'):
+        # same rules as is_null_missing_blank and valid_zip_code, inlined (one
+        # .get per field, no method calls) since this runs once per record
+        name = record.get('name')
+        if name is None or name in BLANK_VALUES:
             return False
-        if self.is_null_missing_blank(record, 'address'):
+        address = record.get('address')
+        if address is None or address in BLANK_VALUES:
             return False
-        if self.is_null_missing_blank(record, 'zip'):
-            return False
-        if not self.valid_zip_code(record['zip']):
-            return False
-        return True
+        zip_code = record.get('zip')
+        return type(zip_code) is str and ZIP_CODE_MATCH(zip_code) is not None
 
-    def validate_file(self, file_path):
+    def validate_file(self, file_path, stream=None):
         """
         For a JSON-encoded file at file_path, determine which records are invalid.
         The ID of invalid records will be added to the self.bad_records list.
+        If stream is True and ijson is installed, records are decoded one at a
+        time instead of loading the whole file; by default, only files over
+        STREAM_THRESHOLD are streamed. Note that ijson's C backend rejects
+        NaN/Infinity and integers over 64 bits, which load_json accepts.
         """
-        with open(file_path) as f:
-            data = json.load(f)
-            for d in data:
-                if self.have_seen(d):
-                    self.add_to_bad_records(d)
-                    self.add_duplicate_to_bad_records(d)
-                elif not self.record_is_valid(d): # if duplicate, doesn't matter if otherwise valid
-                    self.add_to_bad_records(d)
+        if stream is None:
+            stream = os.path.getsize(file_path) > STREAM_THRESHOLD
+        if stream and ijson is not None:
+            with open(file_path, 'rb') as f:
+                if f.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+                    f.seek(0)
+                try:
+                    self.validate_records(ijson.items(f, 'item', buf_size=STREAM_BUFFER_SIZE, use_float=True))
+                except ijson.JSONError as err:
+                    raise ValueError(err) from err
+        else:
+            with open(file_path, 'rb') as f:
+                data = load_json(f.read())
+            self.validate_records(data)
+
+    def validate_records(self, records):
+        """
+        Determine which of an iterable of records are invalid, adding their IDs
+        to self.bad_records. Can be called repeatedly; duplicates are detected
+        across calls.
+        """
+        # bind attributes to locals once rather than looking them up per record
+        mark_if_duplicate = self.mark_if_duplicate
+        fingerprint = self.fingerprint
+        record_is_valid = self.record_is_valid
+        bad_records = self.bad_records
+        for d in records:
+            if mark_if_duplicate(fingerprint(d), d['id']):
+                continue # if duplicate, doesn't matter if otherwise valid
+            if not record_is_valid(d):
+                bad_records.add(d['id'])
+
+    def mark_if_duplicate(self, fp, record_id):
+        """
+        Add a fingerprint to self.records_seen. If it was already there, add
+        both the earlier record's ID and record_id to self.bad_records and
+        return True.
+        """
+        # single lookup: setdefault returns the first ID seen for this
+        # fingerprint, and only grows the dict if the record is new
+        n_seen = len(self.records_seen)
+        first_id = self.records_seen.setdefault(fp, record_id)
+        if len(self.records_seen) == n_seen:
+            self.bad_records.update((first_id, record_id))
+            return True
+        return False
 
     def print_invalid_records(self):
         """
         Print the IDs of invalid records.
         """
-        for a in self.bad_records:
-            print(a)
+        if self.bad_records:
+            sys.stdout.write('\n'.join(map(str, self.bad_records)) + '\n')
 
 class TestValidator(unittest.TestCase):
     """
@@ -138,6 +197,10 @@ class TestValidator(unittest.TestCase):
         self.assertTrue(self.validator.is_null_missing_blank({'key': 'value'}, "name"))
         self.assertTrue(self.validator.is_null_missing_blank({'name': ''}, "name"))
         self.assertTrue(self.validator.is_null_missing_blank({'name': None}, "name"))
+        self.assertTrue(self.validator.is_null_missing_blank({'name': []}, "name"))
+        self.assertTrue(self.validator.is_null_missing_blank({'name': {}}, "name"))
+        for value in [0, False, 5, True, 0.0, ['x'], {'a': ''}]:
+            self.assertFalse(self.validator.is_null_missing_blank({'name': value}, "name"))
 
     def test_zip_code(self):
         self.assertTrue(self.validator.valid_zip_code("00000"))
@@ -148,16 +211,47 @@ class TestValidator(unittest.TestCase):
         self.assertFalse(self.validator.valid_zip_code("00"))
         self.assertFalse(self.validator.valid_zip_code("0000000000000000"))
         self.assertFalse(self.validator.valid_zip_code("qwertyuio"))
+        self.assertFalse(self.validator.valid_zip_code("0000-00000"))
+        self.assertFalse(self.validator.valid_zip_code("00000-0000\n"))
+        self.assertFalse(self.validator.valid_zip_code("\u0660\u0660\u0660\u0660\u0660")) # non-ASCII digits
+        self.assertFalse(self.validator.valid_zip_code(12345)) # not a string
+
+    def test_mark_if_duplicate(self):
+        validator = self.validator
+        self.assertFalse(validator.mark_if_duplicate(('fp',), '1')) # new fingerprint
+        self.assertFalse(validator.mark_if_duplicate(('other',), '2'))
+        self.assertEqual(validator.bad_records, set())
+        self.assertTrue(validator.mark_if_duplicate(('fp',), '3')) # marks both IDs
+        self.assertEqual(validator.bad_records, {'1', '3'})
+        self.assertTrue(validator.mark_if_duplicate(('other',), '2')) # same ID twice
+        self.assertEqual(validator.bad_records, {'1', '2', '3'})
+        self.assertEqual(validator.records_seen, {('fp',): '1', ('other',): '2'})
 
-    def test_have_seen(self):
-        self.assertFalse(self.validator.have_seen({'a':'0', 'b':'1', 'c':'2', 'id':'3'}))
-        self.assertTrue(self.validator.have_seen({'a':'0', 'b':'1', 'c':'2', 'id':'3'})) # identical record
-        self.assertTrue(self.validator.have_seen({'a':'0', 'b':'1', 'c':'2', 'id':'4'})) # different ID
-        self.assertFalse(self.validator.have_seen({'a':'0', 'b':'1', 'c':'2', 'd':'4', 'id':'5'})) # extra property
-        self.assertFalse(self.validator.have_seen({'a':'0', 'b':'1', 'id':'6'})) # missing property
-        self.assertFalse(self.validator.have_seen({'a':0, 'b':1, 'c': 2, 'id':'7'})) # 0 != '0'
-        self.assertFalse(self.validator.have_seen({'a':  None,  'b':1, 'c': 2, 'id':'8'}))
-        self.assertFalse(self.validator.have_seen({'a': 'None', 'b':1, 'c': 2, 'id':'9'})) # None != 'None'
+    def test_duplicate_fingerprints(self):
+        def is_duplicate(record):
+            return self.validator.mark_if_duplicate(self.validator.fingerprint(record), record['id'])
+        self.assertFalse(is_duplicate({'a':'0', 'b':'1', 'c':'2', 'id':'3'}))
+        self.assertTrue(is_duplicate({'a':'0', 'b':'1', 'c':'2', 'id':'3'})) # identical record
+        self.assertTrue(is_duplicate({'a':'0', 'b':'1', 'c':'2', 'id':'4'})) # different ID
+        self.assertFalse(is_duplicate({'a':'0', 'b':'1', 'c':'2', 'd':'4', 'id':'5'})) # extra property
+        self.assertFalse(is_duplicate({'a':'0', 'b':'1', 'id':'6'})) # missing property
+        self.assertFalse(is_duplicate({'a':0, 'b':1, 'c': 2, 'id':'7'})) # 0 != '0'
+        self.assertFalse(is_duplicate({'a':  None,  'b':1, 'c': 2, 'id':'8'}))
+        self.assertFalse(is_duplicate({'a': 'None', 'b':1, 'c': 2, 'id':'9'})) # None != 'None'
+        self.assertTrue(is_duplicate({'c':'2', 'b':'1', 'a':'0', 'id':'10'})) # field order ignored
+        # nested values (unhashable, so compared by repr)
+        self.assertFalse(is_duplicate({'a':['0'], 'id':'11'}))
+        self.assertTrue(is_duplicate({'a':['0'], 'id':'12'}))
+        self.assertFalse(is_duplicate({'a':['1'], 'id':'13'}))
+        self.assertFalse(is_duplicate({'a':{'b':'0'}, 'id':'14'}))
+        self.assertTrue(is_duplicate({'a':{'b':'0'}, 'id':'15'}))
+        # values that are equal in Python but of different JSON types
+        self.assertFalse(is_duplicate({'a':1, 'id':'16'}))
+        self.assertFalse(is_duplicate({'a':True, 'id':'17'})) # 1 != True
+        self.assertFalse(is_duplicate({'a':1.0, 'id':'18'})) # 1 != 1.0
+        self.assertTrue(is_duplicate({'a':1, 'id':'19'}))
+        self.assertFalse(is_duplicate({'a':[1], 'id':'20'}))
+        self.assertFalse(is_duplicate({'a':[True], 'id':'21'})) # 1 != True, nested
 
     def test_add_to_bad_records(self):
         self.validator.add_to_bad_records({'a':'0', 'id':'1'})
@@ -192,6 +286,41 @@ class TestValidator(unittest.TestCase):
         self.assertTrue(ids[3] in self.validator.bad_records)
         self.assertTrue(ids[4] in self.validator.bad_records)
 
+    def test_validate_file_stream(self):
+        """
+        Streaming a file gives the same result as loading it, including for
+        a file starting with a UTF-8 byte order mark. (Without ijson, both
+        load the whole file.)
+        """
+        test_data = [
+            {'name':'0', 'address':'1', 'zip':'00000', 'id':'1'},
+            {'name':'\u00e9', 'address':'2', 'zip':'00000-0000', 'id':'2'},
+            {'name':'0', 'address':'1', 'zip':'00000', 'id':'3'},
+            {'name':'4', 'address':'', 'zip':'00000', 'id':'4'},
+            {'name':'5', 'address':'5', 'zip':1.5e1, 'id':'5'}
+            ]
+        test_file = '/tmp/test-file-stream.json'
+        with open(test_file, 'w', encoding='utf-8-sig') as f:
+            json.dump(test_data, f, ensure_ascii=False)
+        self.validator.validate_file(test_file, stream=False)
+        self.assertEqual(self.validator.bad_records, {'1', '3', '4', '5'})
+        streamed = DataValidator()
+        streamed.validate_file(test_file, stream=True)
+        self.assertEqual(streamed.bad_records, self.validator.bad_records)
+        with open(test_file, 'w') as f:
+            f.write('[{"name": "0", "address": "1", "zip": "00000", "id": "1"}] junk')
+        with self.assertRaises(ValueError):
+            DataValidator().validate_file(test_file, stream=True)
+
+    def test_load_json(self):
+        self.assertEqual(load_json(b'[{"id": "1"}]'), [{'id': '1'}])
+        # accepted by json.loads but not by orjson
+        data = load_json(b'\xef\xbb\xbf[NaN, Infinity, 18446744073709551616]')
+        self.assertNotEqual(data[0], data[0])
+        self.assertEqual(data[1:], [float('inf'), 1 << 64])
+        with self.assertRaises(ValueError):
+            load_json(b'[1,]')
+
     def test_record_is_valid(self):
         """
         Test the specification for a valid record:
@@ -212,8 +341,20 @@ class TestValidator(unittest.TestCase):
             self.assertFalse(self.validator.record_is_valid(b))
         with self.assertRaises(NoIDError):
             self.validator.record_is_valid({'a':'0'})
+        # the inlined checks agree with is_null_missing_blank and valid_zip_code
+        for key in ['name', 'address']:
+            for value in ['', None, [], {}, 0, False, 5, True, 'x']:
+                c = {'name': 'n', 'address': 'a', 'zip': '00000', 'id': '0', key: value}
+                self.assertEqual(self.validator.record_is_valid(c),
+                                 not self.validator.is_null_missing_blank(c, key))
+        for value in ['00000', '00000-0000', '0000', 12345, 0, [], None]:
+            c = {'name': 'n', 'address': 'a', 'zip': value, 'id': '0'}
+            self.assertEqual(self.validator.record_is_valid(c), self.validator.valid_zip_code(value))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the IDs of invalid or duplicate records.")
+    parser.add_argument('file', nargs='?', default="data.json", help="JSON file to validate (default: data.json)")
+    args = parser.parse_args()
     validator = DataValidator()
-    validator.validate_file("data.json")
+    validator.validate_file(args.file)
     validator.print_invalid_records()